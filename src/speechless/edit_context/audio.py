@@ -6,7 +6,7 @@ from typing import Generator, List, Tuple
 from av.audio.stream import AudioStream
 from av.audio.frame import format_dtypes
 
-from .common import EditCtx, TimelineChange, Real
+from .common import EditCtx, Real
 from speechless.utils.math import ranges_of_truth, int_linspace_steps_by_limit
 
 WIN_TYPE = 'hann'
@@ -292,11 +292,12 @@ class AudioEditContext(EditCtx):
     self.workspaces = []  # sorted by pts
     self.dst_vframes = []
 
-  def prepare_for_editing(self, changes: List[TimelineChange]) -> bool:
+  def prepare_for_editing(self, changes: np.ndarray) -> bool:
     """Prepares this context for editing by creating editing workspaces
 
     Args:
-        changes (List[TimelineChange]): Timeline changes to make
+        changes (np.ndarray): Timeline changes to make, an array of shape (N, 3) (see
+        `TimelineChange.from_numpy`)
 
     Returns:
         bool: Whether the destination stream will be empty
@@ -416,10 +417,12 @@ class AudioEditContext(EditCtx):
     if self.num_frames_encoded < len(self.dst_vframes) and len(frames) > 0:
       # generate silent frames
       src_frame = frames[0]
-      src_data = src_frame.to_ndarray()
+      dtype = np.dtype(format_dtypes[src_frame.format.name])
+      # silent frames share a single read-only buffer (data is copied when a frame is created)
+      silence = np.zeros((len(src_frame.layout.channels), np.max(self.dst_vframes)), dtype=dtype)
+      silence.setflags(write=False)
       while self.num_frames_encoded < len(self.dst_vframes):
-        data_shape = (len(src_frame.layout.channels), self.dst_vframes[self.num_frames_encoded])
-        data = np.zeros(data_shape, dtype=src_data.dtype)
+        data = silence[:, :self.dst_vframes[self.num_frames_encoded]]
         v_frame = create_audio_frame(src_frame, data)
         yield v_frame, data
 
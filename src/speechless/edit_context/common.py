@@ -64,6 +64,37 @@ class TimelineChange:
       if not (0 <= changes[-1].beg < changes[-1].end):
         raise ValueError('Change range must be of length greater than 0')
 
+  @staticmethod
+  def check_changes_array(arr: np.ndarray) -> None:
+    """Checks whether an array of timeline changes is valid
+
+    Args:
+        arr (np.ndarray): Array of timeline changes of shape (N, 3) (see `from_numpy`)
+
+    Raises:
+        ValueError: When changes are not sorted properly or one of them has a range of length <= 0
+    """
+    assert len(arr.shape) == 2 and arr.shape[1] == 3
+    if arr.shape[0] > 0:
+      begs, ends = arr[:, 0], arr[:, 1]
+      if not (np.all(begs[1:] >= ends[:-1]) and begs[0] >= 0):
+        raise ValueError('Changes must be sorted, mutually exclusive, and with ranges of length '
+                         'greater than zero')
+      if not np.all(begs < ends):
+        raise ValueError('Change range must be of length greater than 0')
+
+  @staticmethod
+  def to_numpy(changes: List['TimelineChange']) -> np.ndarray:
+    """Creates a numpy ndarray from a list of timeline changes
+
+    Args:
+        changes (List[TimelineChange]): List of timeline changes
+
+    Returns:
+        np.ndarray: Array of shape (N, 3) (see `from_numpy`)
+    """
+    return np.array([[c.beg, c.end, c.multi] for c in changes], dtype=Real).reshape((-1, 3))
+
   @staticmethod
   def from_numpy(arr: np.ndarray) -> List['TimelineChange']:
     """Creates a list of timeline changes from a numpy ndarray
@@ -76,9 +107,8 @@ class TimelineChange:
     Returns:
         List[TimelineChange]: List of timeline changes
     """
-    changes = [TimelineChange(*r) for r in arr]
-    TimelineChange.check_changes_list(changes)
-    return changes
+    TimelineChange.check_changes_array(arr)
+    return [TimelineChange(*r) for r in arr]
 
   @staticmethod
   def combine_changes(primary: List['TimelineChange'],
@@ -123,6 +153,7 @@ class EditCtx:
     self.dst_stream = dst_stream
     self.num_frames_to_encode = None
     self.num_frames_encoded = 0
+    self.src_pts = None  # PTS of the source stream's packets (see `read_src_pts`)
 
   def is_done(self) -> bool:
     """Returns whether editing is done for this context
@@ -134,17 +165,16 @@ class EditCtx:
     return self.num_frames_encoded >= self.num_frames_to_encode
 
   def _prepare_src_durations(self) -> Tuple[np.ndarray, bool]:
-    """Demuxes each packet in the source stream in order to calculate the duration of each frame
-    using Presentation TimeStamp of packets
+    """Calculates the duration of each frame using Presentation TimeStamp of packets. When the PTS
+    were not read beforehand (see `read_src_pts`), demuxes each packet in the source stream
 
     Returns:
         Tuple[np.ndarray, bool]: An array of frame durations and whether the first duration is
         virtual - duration of a non-existent frame added to streams that do not start at 0 second
     """
-    pts = []
-    for packet in self.src_stream.container.demux(self.src_stream):
-      if packet.pts is not None and packet.pts >= 0:
-        pts.append(packet.pts)
+    if self.src_pts is None:
+      read_src_pts(self.src_stream.container, {self.src_stream.index: self})
+    pts = self.src_pts
     if len(pts) < 2:  # there must be at least 2 frames
       return (np.ndarray(shape=(0,)), False)
 
@@ -160,52 +190,65 @@ class EditCtx:
     first_is_virtual = len(virtual_first) == 1
     return (src_durs, first_is_virtual)
 
-  def _prepare_raw_dst_durations(self, src_durs: np.ndarray,
-                                 changes: List[TimelineChange]) -> np.ndarray:
+  def _prepare_raw_dst_durations(self, src_durs: np.ndarray, changes: np.ndarray) -> np.ndarray:
     """Prepares the durations of the destination stream's frames according to the specified timeline
     changes.
 
     Args:
         src_durs (np.ndarray): Durations of the source stream's frames
-        changes (List[TimelineChange]): List of timeline changes to make. The ranges of changes must
-        be mutually exclusive and sorted ascending order of their starts
+        changes (np.ndarray): Array of timeline changes to make, of shape (N, 3) (see
+        `TimelineChange.from_numpy`). The ranges of changes must be mutually exclusive and sorted in
+        ascending order of their starts
 
     Returns:
         np.ndarray: Durations of the destination stream's frames
     """
-    dst_durs = []
-    r_idx = 0
-    fr_end = Real(0)
+    dst_durs = src_durs.astype(Real)
+    fr_ends = np.cumsum(src_durs, dtype=Real)
+    fr_begs = np.concatenate([[Real(0)], fr_ends[:-1]])
     src_stream_end = np.sum(src_durs, dtype=Real)
-    for old_dur in src_durs:
-      fr_beg = fr_end
-      fr_end = fr_beg + old_dur
-      new_dur = 0
-
-      # go through all timeline changes that modify current frame
-      while r_idx < len(changes) and fr_beg < changes[r_idx].end and fr_end > changes[r_idx].beg:
-        clamped_beg = np.max([changes[r_idx].beg, fr_beg])
-        clamped_end = np.min([changes[r_idx].end, fr_end])
-        part_dur = clamped_end - clamped_beg
-        assert np.round(old_dur - part_dur, 12) >= 0
-
-        old_dur -= part_dur
-        new_dur += part_dur * changes[r_idx].multi
-        if clamped_end < changes[r_idx].end:
-          # this change extends beyond this frame (was clamped), move to the next frame
-          break
-        else:
-          # this change ends on this frame (wasn't clamped), move to the next change
-          r_idx += 1
-      new_dur += old_dur
+    for beg, end, multi in changes:
+      # frames modified by this change: fr_beg < end and fr_end > beg
+      first = np.searchsorted(fr_ends, beg, side='right')
+      last = np.searchsorted(fr_begs, end, side='left')
+      if first >= last:
+        continue
+      part_durs = (np.minimum(fr_ends[first:last], end) - np.maximum(fr_begs[first:last], beg))
+      # frames entirely within the change are scaled exactly (deleted frames must end up with 0)
+      is_whole = (fr_begs[first:last] >= beg) & (fr_ends[first:last] <= end)
+      part_durs[is_whole] = src_durs[first:last][is_whole]
+      assert np.all(np.round(src_durs[first:last] - part_durs, 12) >= 0)
+      dst_durs[first:last] -= part_durs
+      dst_durs[first:last] += part_durs * multi
+
+    # early stop when the recording has trimmed end (by a change that extends beyond a frame)
+    end_changes = np.flatnonzero(changes[:, 1] >= src_stream_end) if len(changes) > 0 else []
+    if len(end_changes) > 0:
+      beg, end, _ = changes[end_changes[0]]
+      trimmed = np.flatnonzero((fr_ends > beg) & (fr_ends < end) & (dst_durs == 0))
+      if len(trimmed) > 0:
+        dst_durs = dst_durs[:trimmed[0]]
+
+    return dst_durs if len(dst_durs) >= 2 else np.array([])
+
+
+def read_src_pts(container: av.container.InputContainer, ctx_map: Dict[int, EditCtx]) -> None:
+  """Demuxes each packet of the provided contexts' source streams (all in a single pass through the
+  container) and stores their Presentation TimeStamps in the contexts
 
-      # early stop when the recording has trimmed end
-      if (new_dur == 0 and r_idx < len(changes) and fr_end > changes[r_idx].beg and
-          changes[r_idx].end >= src_stream_end):
-        break
-      dst_durs.append(new_dur)
+  Args:
+      container (av.container.InputContainer): Container of the source streams
+      ctx_map (Dict[int, EditCtx]): Map of contexts to update (mapping: stream_index -> context)
+  """
+  for ctx in ctx_map.values():
+    assert ctx.src_stream.container is container
+    ctx.src_pts = []
+  if len(ctx_map) == 0:
+    return
 
-    return np.array(dst_durs, dtype=Real) if len(dst_durs) >= 2 else np.array([])
+  for packet in container.demux([ctx.src_stream for ctx in ctx_map.values()]):
+    if packet.pts is not None and packet.pts >= 0:
+      ctx_map[packet.stream.index].src_pts.append(packet.pts)
 
 
 def restart_container(container: av.container.InputContainer, ctx_map: Dict[int, EditCtx]) \
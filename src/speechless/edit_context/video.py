@@ -1,10 +1,10 @@
 import av
 import numpy as np
 
-from typing import Generator, List
+from typing import Generator
 from av.video.stream import VideoStream
 
-from .common import EditCtx, TimelineChange
+from .common import EditCtx
 from speechless.utils.math import Real
 
 DROP_FRAME_PTS = -1
@@ -25,12 +25,13 @@ class VideoEditContext(EditCtx):
     self.max_fps = max_fps
     self.dst_pts = None
 
-  def prepare_for_editing(self, changes: List[TimelineChange]) -> bool:
+  def prepare_for_editing(self, changes: np.ndarray) -> bool:
     """Prepares this context for editing by calculating the durations of the destination stream's
     frames
 
     Args:
-        changes (List[TimelineChange]): Timeline changes to make
+        changes (np.ndarray): Timeline changes to make, an array of shape (N, 3) (see
+        `TimelineChange.from_numpy`)
 
     Returns:
         bool: Whether the destination stream will be empty
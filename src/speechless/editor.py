@@ -7,12 +7,14 @@ from fractions import Fraction
 from logging import Logger
 from pathlib import Path
 from argparse import ArgumentParser
+from av.codec.context import ThreadType
 
 from .utils.cli import cli_subcommand
 from .utils.logging import NULL_LOGGER
 from .utils.config import CfgID
+from .utils.math import Real
 from .edit_context import TimelineChange, EditCtx, VideoEditContext, AudioEditContext
-from .edit_context.common import restart_container
+from .edit_context.common import read_src_pts, restart_container
 
 SUPPORTED_STREAM_TYPES = [CfgID.VIDEO_STREAM, CfgID.AUDIO_STREAM]
 
@@ -48,19 +50,22 @@ class Editor:
     """
     self.logger.info(f'Started editing: "{src_path}"')
 
-    src_path = str(Path(src_path).resolve())
-    changes = TimelineChange.from_numpy(changes) if isinstance(changes, np.ndarray) else changes
+    src_path = str(Path(src_path).resolve(strict=True))
+    changes = changes if isinstance(changes, np.ndarray) else TimelineChange.to_numpy(changes)
+    changes = changes.reshape((-1, 3))
+    TimelineChange.check_changes_array(changes)
     dst_path = str(Path(dst_path).resolve())
-    source = av.open(str(src_path))
+    source = av.open(src_path)
     dest, ctx_map = self.prepare_destination(source, dst_path)
 
-    # prepare contexts of streams for editing
-    valid_streams = []
-    for idx, ctx in ctx_map.items():
-      if ctx.prepare_for_editing(changes):
-        valid_streams.append(idx)
-      source = restart_container(source, ctx_map)  # start from the beginning
+    # prepare contexts of streams for editing (timestamps of all streams are read in a single pass)
+    read_src_pts(source, ctx_map)
+    valid_streams = [idx for idx, ctx in ctx_map.items() if ctx.prepare_for_editing(changes)]
+    source = restart_container(source, ctx_map)  # start from the beginning
     valid_streams = [ctx_map[idx].src_stream for idx in valid_streams]
+    for src_stream in valid_streams:
+      # streams were recreated by restart_container, so the decoders are configured only now
+      enable_threading(src_stream.codec_context)
 
     # edit
     if len(valid_streams) > 0:
@@ -68,9 +73,12 @@ class Editor:
         ctx = ctx_map[src_packet.stream.index]
         if ctx.is_done():
           continue
+        # with frame threading, a decoder might not return any frames for the first few packets -
+        # these are returned later (at the latest for the empty flush packets at the end of demux)
         for dst_packet in ctx.decode_edit_encode(src_packet):
           dest.mux(dst_packet)
-        if all(ctx.is_done() for ctx in ctx_map.values()):  # early stop when all are done
+        # early stop when all edited streams are done
+        if all(ctx_map[stream.index].is_done() for stream in valid_streams):
           break
       for idx, ctx in ctx_map.items():
         if not ctx.is_done():
@@ -155,8 +163,7 @@ class Editor:
         dst_stream.channels = channels
         ctx_map[src_stream.index] = AudioEditContext(src_stream, dst_stream)
 
-      src_stream.thread_type = 'AUTO'
-      dst_stream.thread_type = 'AUTO'
+      enable_threading(dst_stream.codec_context)
 
     # check if all video streams have high enough resolution of the time_base
     dst.start_encoding()
@@ -189,15 +196,15 @@ class Editor:
 
   @staticmethod
   def from_json(json_settings: dict, logger: Logger = NULL_LOGGER) \
-    -> Tuple['Editor', List[TimelineChange]]:
+    -> Tuple['Editor', np.ndarray]:
     """Constructs an Editor from a dictionary of settings.
 
     Returns:
-        Tuple['Editor', List[TimelineChange]]: Configured editor prepared for editing and timeline \
-          changes
+        Tuple['Editor', np.ndarray]: Configured editor prepared for editing and timeline changes \
+          (array of shape (N, 3), see TimelineChange.check_changes_array)
     """
     editor = Editor(logger=logger)
-    changes = []
+    changes = np.ndarray((0, 3), dtype=Real)
     for identifier, config in json_settings.items():
       identifier = identifier.lower()
       if identifier in [CfgID.VIDEO_STREAM, CfgID.AUDIO_STREAM]:
@@ -206,46 +213,92 @@ class Editor:
         settings = editor.settings.setdefault(int(identifier), {})  # stream idx
       else:
         if identifier == CfgID.TIMELINE_CHANGES:
-          for tl_change in config:
-            changes.append(np.array(tl_change).reshape((1, -1)))
+          changes = np.asarray(config, dtype=Real).reshape((-1, 3))
         elif not CfgID.has_value(identifier):
           logger.warning(f'Skipping unrecognized identifier: {identifier}')
         continue
 
       for key, value in config.items():
-        if key == CfgID.CODEC:
-          settings[key] = str(value)
-        elif key == CfgID.CODEC_OPTIONS:
-          settings[key] = value
-          for option_key, option_value in value.items():
-            value[option_key] = str(option_value)
-        elif key == CfgID.BITRATE:
-          settings[key] = int(value)  # bitrate in b/s
-          if settings[key] <= 0:
-            raise ValueError(f'"{CfgID.BITRATE}" must be a positive number')
-        elif key == CfgID.RESOLUTION:
-          settings[key] = [int(dim) for dim in value]  # [width, height]
-          if settings[key][0] * settings[key][1] <= 0:
-            raise ValueError(f'"{CfgID.RESOLUTION}" must consist of positive numbers')
-        elif key == CfgID.MAX_FPS:
-          settings[key] = float(value)
-          if settings[key] <= 0:
-            raise ValueError(f'"{CfgID.MAX_FPS}" must be a positive number')
-        elif key == CfgID.SAMPLE_RATE:
-          settings[key] = int(value)
-          if settings[key] <= 0:
-            raise ValueError(f'"{CfgID.SAMPLE_RATE}" must be a positive number')
-        elif key == CfgID.MONO:
-          settings[key] = bool(value)
+        parse_fn = SETTING_PARSERS.get(key, None)
+        if parse_fn is not None:
+          settings[key] = parse_fn(value)
         else:
           logger.warning(f'Skipping unrecognized setting: {key}:')
 
-    if len(changes) > 0:
-      changes = TimelineChange.from_numpy(np.concatenate(changes, axis=0))
-
+    TimelineChange.check_changes_array(changes)
     return editor, changes
 
 
+def enable_threading(codec_ctx: av.codec.context.CodecContext) -> None:
+  """Enables multithreaded decoding/encoding for a codec context. This must be called before the
+  codec context is opened (before the first decoded packet or encoded frame)
+
+  Args:
+      codec_ctx (av.codec.context.CodecContext): Codec context to configure
+  """
+  codec_ctx.thread_count = 0  # let libav pick the number of threads (number of cpus)
+  codec_ctx.thread_type = ThreadType.AUTO  # FRAME | SLICE
+
+
+def parse_positive(key: str, value: Union[int, float]) -> Union[int, float]:
+  """Checks whether the value of a setting is a positive number
+
+  Args:
+      key (str): Identifier of the setting
+      value (Union[int, float]): Value to check
+
+  Raises:
+      ValueError: When the value is not positive
+
+  Returns:
+      Union[int, float]: The checked value
+  """
+  if value <= 0:
+    raise ValueError(f'"{key}" must be a positive number')
+  return value
+
+
+def parse_resolution(value: List[int]) -> List[int]:
+  """Converts and checks the value of the resolution setting
+
+  Args:
+      value (List[int]): Resolution: [width, height]
+
+  Raises:
+      ValueError: When one of the dimensions is not positive
+
+  Returns:
+      List[int]: Resolution: [width, height]
+  """
+  resolution = [int(dim) for dim in value]  # [width, height]
+  if resolution[0] * resolution[1] <= 0:
+    raise ValueError(f'"{CfgID.RESOLUTION}" must consist of positive numbers')
+  return resolution
+
+
+def parse_codec_options(value: Dict[str, object]) -> Dict[str, str]:
+  """Converts the value of the codec options setting
+
+  Args:
+      value (Dict[str, object]): Codec options: {option: value}
+
+  Returns:
+      Dict[str, str]: Codec options with values converted to strings
+  """
+  return {key: str(val) for key, val in value.items()}
+
+
+# mapping: setting identifier -> function that converts and validates the value of the setting
+SETTING_PARSERS = {
+    CfgID.CODEC: str,
+    CfgID.CODEC_OPTIONS: parse_codec_options,
+    CfgID.BITRATE: lambda value: parse_positive(CfgID.BITRATE, int(value)),  # bitrate in b/s
+    CfgID.RESOLUTION: parse_resolution,
+    CfgID.MAX_FPS: lambda value: parse_positive(CfgID.MAX_FPS, float(value)),
+    CfgID.SAMPLE_RATE: lambda value: parse_positive(CfgID.SAMPLE_RATE, int(value)),
+    CfgID.MONO: bool,
+}
+
 ############################################### CLI ################################################
 
 
@@ -286,7 +339,6 @@ class CLI:
     args = args.__dict__
     with open('test.json', 'r', encoding='UTF-8') as fp:
       json_cfg = json.load(fp)
-    editor = Editor.from_json(json_cfg, logger=logger)
-    changes = np.array(json_cfg[CfgID.TIMELINE_CHANGES])
+    editor, changes = Editor.from_json(json_cfg, logger=logger)
     # editor.export_json(changes, 'test2.json')
     editor.edit(args[CLI.ARG_SRC], changes, args[CLI.ARG_DST])
@@ -10,27 +10,28 @@ from speechless.utils.math import ranges_of_truth
 
 TOKEN_SEPARATOR = ' '
 SENTENCE_SEPARATOR = '.' + TOKEN_SEPARATOR
-SENTENCE_SEPARATOR_VALID_SET = {SENTENCE_SEPARATOR, '?' + TOKEN_SEPARATOR, '!' + TOKEN_SEPARATOR}
-SENTENCE_SEPARATOR_INVALID_SET = {',' + TOKEN_SEPARATOR}
+# tuples, so they can be passed directly to str.endswith
+SENTENCE_SEPARATORS_VALID = (SENTENCE_SEPARATOR, '?' + TOKEN_SEPARATOR, '!' + TOKEN_SEPARATOR)
+SENTENCE_SEPARATORS_INVALID = (',' + TOKEN_SEPARATOR,)
+SENTENCE_MAX_PAUSE = 3.0  # seconds between tokens after which a sentence is split
+SENTENCE_MIN_SPLIT_LEN = 20 * 5 * 2  # (avg_sent_length) * (avg_eng_word) * 2 (in characters)
 
 USELESS_TOKENS_SET = {'um', 'em', 'uh', 'er', 'hm', 'hmm'}
 
-SPACY_MODEL = 'en_core_web_md'
+SPACY_MODEL = 'en_core_web_sm'
+SPACY_EXCLUDED_PIPES = ['parser', 'ner']  # sentences are segmented by the sentencizer or senter
 
 
 class EditToken:
+  __slots__ = ('text', 'start_time', 'end_time', 'start_pos', 'index', 'label')
   TEXT_SUB_PATTERNS = re.compile(r'(\[[^\]]*\])|'  # text in []
                                  r'(\([^\)]*\))')  # text in ()
-  WHITESPACE_SUB_PATTERNS = re.compile(r'(^\s+)|'  # whitespaces at the beginning
-                                       r'(\s+$)|'  # whitespaces at the end
-                                       r'((?<=\s)\s+)')  # multiple whitespaces
-  WHITESPACE_PATTERN = re.compile(r'\s')
 
   def __init__(self, text: str, start_time: float, end_time: float):
     """Some part of the transcript, for which the timestamps are known. The text of the token is
     being normalized, which might reduce it to an empty string - this should be properly handled.
-    See `TEXT_SUB_PATTERNS` and `WHITESPACE_SUB_PATTERNS` for patterns, which are removed from the
-    text of the token.
+    See `TEXT_SUB_PATTERNS` for patterns, which are removed from the text of the token. Whitespaces
+    are stripped from both ends and each sequence of them is replaced with a single TOKEN_SEPARATOR.
 
     Args:
         text (str): Text that occurred in the transcript of the recording
@@ -41,9 +42,8 @@ class EditToken:
     self.end_time = end_time
     assert self.start_time < self.end_time
 
-    self.text = self.TEXT_SUB_PATTERNS.sub('', text)
-    self.text = self.WHITESPACE_SUB_PATTERNS.sub('', self.text)
-    self.text = self.WHITESPACE_PATTERN.sub(TOKEN_SEPARATOR, self.text)  # normalize whitespaces
+    # str.split() (without arguments) splits on the same whitespaces as r'\s' and drops empty parts
+    self.text = TOKEN_SEPARATOR.join(self.TEXT_SUB_PATTERNS.sub('', text).split())
 
     self.start_pos = None  # position in the document (character)
     self.index = None  # index of the token in the document
@@ -56,6 +56,21 @@ class EditToken:
     return len(self.text)
 
 
+def spacy_language() -> spacy.language.Language:
+  """Returns a static instance of spaCy language, so it is initialized only once (on the first call)
+
+  Returns:
+      spacy.language.Language: spaCy language
+  """
+  if not hasattr(spacy_language, 'nlp'):  # lazy initialization of the spaCy Language
+    spacy.prefer_gpu()  # must be called before loading, falls back to the CPU when not available
+    spacy_language.nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_PIPES)
+    spacy_language.nlp.add_pipe('sentencizer')
+    spacy_language.nlp.enable_pipe('senter')  # disabled by default in trained pipelines
+    spacy_language.nlp.Defaults.stop_words |= USELESS_TOKENS_SET | {'okay', 'right'}
+  return spacy_language.nlp
+
+
 def spacy_nlp(text: str, pipes: List[str]) -> spacy.tokens.Doc:
   """Runs spaCy on a provided text. This function uses a static instance of spaCy language, so it is
   initialized only once.
@@ -67,11 +82,22 @@ def spacy_nlp(text: str, pipes: List[str]) -> spacy.tokens.Doc:
   Returns:
       spacy.tokens.Doc: spaCy document generated from the text
   """
-  if not hasattr(spacy_nlp, 'nlp'):  # lazy initialization of the spaCy Language
-    spacy_nlp.nlp = spacy.load(SPACY_MODEL)
-    spacy_nlp.nlp.Defaults.stop_words |= USELESS_TOKENS_SET | {'okay', 'right'}
-  with spacy_nlp.nlp.select_pipes(enable=pipes):
-    return spacy_nlp.nlp(text)
+  nlp = spacy_language()
+  with nlp.select_pipes(enable=pipes):
+    return nlp(text)
+
+
+def token_start_positions(tokens: List[EditToken]) -> np.ndarray:
+  """Calculates the positions (in characters) of tokens in a document made of their texts
+
+  Args:
+      tokens (List[EditToken]): Consecutive tokens of the document
+
+  Returns:
+      np.ndarray: Start positions of the tokens
+  """
+  token_lens = np.fromiter((len(token) for token in tokens), dtype=int, count=len(tokens))
+  return np.concatenate([[0], np.cumsum(token_lens[:-1])]).astype(int)
 
 
 def sentence_segmentation(transcript: List[EditToken]) -> List[List[EditToken]]:
@@ -84,20 +110,23 @@ def sentence_segmentation(transcript: List[EditToken]) -> List[List[EditToken]]:
       List[List[EditToken]]: Segmented transcript. Each list of tokens is a separate sentence
   """
   # 0. Add a separator between tokens
-  transcript[0].start_pos = 0
-  for token, next_token in zip(transcript[:-1], transcript[1:]):
+  for token in transcript[:-1]:
     token.text += TOKEN_SEPARATOR
-    next_token.start_pos = token.start_pos + len(token)
+  start_positions = token_start_positions(transcript)
 
-  # assign indices (useful when working with sentences)
-  for idx, token in enumerate(transcript):
+  # assign positions and indices (useful when working with sentences)
+  for idx, (token, start_pos) in enumerate(zip(transcript, start_positions.tolist())):
+    token.start_pos = start_pos
     token.index = idx
 
-  raw_transcript = ''.join([token.text for token in transcript])
+  raw_transcript = ''.join(token.text for token in transcript)
   sentences: List[List[EditToken]] = []
 
   # 1. Segment using spaCy
-  doc = spacy_nlp(raw_transcript, ['tok2vec', 'parser'])
+  # the rule-based sentencizer splits only at punctuation, so transcripts without it (e.g. from
+  # speech to text) are segmented by the statistical senter
+  has_punct = any(token.text.endswith(SENTENCE_SEPARATORS_VALID) for token in transcript)
+  doc = spacy_nlp(raw_transcript, ['sentencizer'] if has_punct else ['senter'])
   nlp_sents = list(doc.sents)
   assert nlp_sents[0].start_char == 0
 
@@ -120,39 +149,42 @@ def sentence_segmentation(transcript: List[EditToken]) -> List[List[EditToken]]:
       sentences.pop()
 
   # 2. Segment by the time between tokens
-  sent_idx = 0
-  while sent_idx < len(sentences):
-    sent = sentences[sent_idx]
-    # sent_len = (sent[-1].start_pos - sent[0].start_pos) + len(sent[-1])
-    # if sent_len > 20 * 5 * 2:  # (avg_sent_length) * (avg_eng_word) * 2
-    for prev_token_idx, (prev_token, token) in enumerate(zip(sent[:-1], sent[1:])):
-      if (token.start_time - prev_token.end_time) > 3.0:
-        token_idx = prev_token_idx + 1
-        new_sent = sent[token_idx:]
-        sentences[sent_idx] = sent[:token_idx]
-        sentences.insert(sent_idx + 1, new_sent)
-        break
-    sent_idx += 1
+  tokens = [token for sent in sentences for token in sent]
+  start_times = np.fromiter((token.start_time for token in tokens), dtype=float, count=len(tokens))
+  end_times = np.fromiter((token.end_time for token in tokens), dtype=float, count=len(tokens))
+  sent_sizes = np.fromiter((len(sent) for sent in sentences), dtype=int, count=len(sentences))
+  sent_firsts = np.concatenate([[0], np.cumsum(sent_sizes[:-1])]).astype(int)
+  sent_lasts = sent_firsts + sent_sizes - 1
+  last_lens = np.fromiter((len(sent[-1]) for sent in sentences), dtype=int, count=len(sentences))
+  # end positions of sentences in characters
+  sent_end_pos = start_positions[sent_lasts] + last_lens
+  # a new sentence starts at the first token of each sentence and after each long pause, as long as
+  # the remaining part of the sentence (from the last split to its end) is long enough
+  sent_starts = np.zeros(len(tokens), dtype=bool)
+  sent_starts[sent_firsts] = True
+  pauses = np.flatnonzero((start_times[1:] - end_times[:-1]) > SENTENCE_MAX_PAUSE) + 1
+  pause_sents = np.searchsorted(sent_firsts, pauses, side='right') - 1
+  piece_first = -1
+  for pause, sent_idx in zip(pauses, pause_sents):
+    piece_first = max(piece_first, sent_firsts[sent_idx])
+    if sent_end_pos[sent_idx] - start_positions[piece_first] > SENTENCE_MIN_SPLIT_LEN:
+      sent_starts[pause] = True
+      piece_first = pause
+  sent_bounds = np.concatenate([np.flatnonzero(sent_starts), [len(tokens)]])
+  sentences = [tokens[beg:end] for beg, end in zip(sent_bounds[:-1], sent_bounds[1:])]
 
   # 3. Add a sentence separator between sentences
   for sent in sentences[:-1]:
     sent_end = sent[-1].text
-    for valid_sep in SENTENCE_SEPARATOR_VALID_SET:
-      if sent_end.endswith(valid_sep):
-        break
-    else:
-      for invalid_sep in SENTENCE_SEPARATOR_INVALID_SET:
-        if sent_end.endswith(invalid_sep):
-          sent_end = sent_end[:-len(invalid_sep)] + SENTENCE_SEPARATOR
-          break
-      else:
-        sent_end = sent_end[:-len(TOKEN_SEPARATOR)] + SENTENCE_SEPARATOR
-      sent[-1].text = sent_end
-
-  # 4. Fix starting positions of tokens
-  tokens = [token for sentence in sentences for token in sentence]
-  for token, next_token in zip(tokens[:-1], tokens[1:]):
-    next_token.start_pos = token.start_pos + len(token)
+    if not sent_end.endswith(SENTENCE_SEPARATORS_VALID):
+      # replace an invalid sentence separator (if present) or the token separator
+      sep_len = next((len(sep) for sep in SENTENCE_SEPARATORS_INVALID if sent_end.endswith(sep)),
+                     len(TOKEN_SEPARATOR))
+      sent[-1].text = sent_end[:-sep_len] + SENTENCE_SEPARATOR
+
+  # 4. Fix starting positions of tokens (sentence separators might have changed lengths of tokens)
+  for token, start_pos in zip(tokens, token_start_positions(tokens).tolist()):
+    token.start_pos = start_pos
 
   return sentences
 